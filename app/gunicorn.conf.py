@@ -0,0 +1,58 @@
+"""
+Configuración de Gunicorn para producción.
+"""
+import multiprocessing
+import os
+
+
+# Servidor
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:5038')
+chdir = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'src')
+
+# Workers: procesos para aprovechar varios núcleos e hilos para solapar
+# las esperas de red y disco de las descargas
+worker_class = 'gthread'
+workers = int(os.environ.get('GUNICORN_WORKERS', multiprocessing.cpu_count()))
+threads = int(os.environ.get('GUNICORN_THREADS', '16'))
+
+# Descargas largas
+timeout = 600
+keepalive = 5
+
+# Heartbeat de los workers en memoria en lugar de disco
+worker_tmp_dir = '/dev/shm'
+
+
+# Servicio de limpieza del proceso maestro (se crea en when_ready)
+cleanup_service = None
+
+
+def when_ready(server):
+    """
+    Inicia la limpieza automática una sola vez, en el proceso maestro.
+    
+    El servicio se construye desde config, sin importar la aplicación: así
+    el maestro no la precarga antes de crear los workers y los HUP siguen
+    recargando el código.
+    
+    Args:
+        server: Arbiter de Gunicorn.
+    """
+    global cleanup_service
+    
+    from config import AEP_DOWNLOAD_FOLDER, build_cleanup_service
+    
+    os.makedirs(AEP_DOWNLOAD_FOLDER, exist_ok=True)
+    cleanup_service = build_cleanup_service()
+    cleanup_service.start()
+
+
+def on_exit(server):
+    """
+    Detiene la limpieza automática al cerrar Gunicorn.
+    
+    Args:
+        server: Arbiter de Gunicorn.
+    """
+    if cleanup_service is not None:
+        cleanup_service.stop()
@@ -2,22 +2,37 @@
 Aplicación Flask para descargar videos de YouTube.
 """
 import os
+import re
 import logging
 import subprocess
+import tempfile
+import threading
+import unicodedata
+import uuid
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Optional
+from urllib.parse import quote
 from flask import (
     Flask, 
     render_template, 
     request, 
     jsonify, 
-    send_file,
+    Response,
     redirect,
     url_for
 )
 from flask_cors import CORS
-from werkzeug.utils import secure_filename
+from werkzeug.exceptions import RequestedRangeNotSatisfiable
+from werkzeug.utils import safe_join, secure_filename
+from werkzeug.wsgi import FileWrapper, wrap_file
 from dotenv import load_dotenv
-from youtube_downloader import AEPYouTubeDownloader
-from file_cleanup import AEPFileCleanupService
+from youtube_downloader import (
+    AEPYouTubeDownloader,
+    AEP_STREAM_FORMAT,
+    extract_video_id
+)
+from config import AEP_DOWNLOAD_FOLDER, build_cleanup_service
+from download_jobs import AEPDownloadJobStore
 
 
 # Cargar variables de entorno
@@ -40,14 +55,25 @@ except Exception as e:
 # Constantes de configuración
 AEP_SECRET_KEY = os.environ.get('SECRET_KEY', 'dev-secret-key-change-in-production')
 AEP_MAX_CONTENT_LENGTH = 500 * 1024 * 1024  # 500 MB
-AEP_FILE_MAX_AGE_HOURS = int(os.environ.get('FILE_MAX_AGE_HOURS', '1'))
-AEP_CLEANUP_INTERVAL_MINUTES = int(os.environ.get('CLEANUP_INTERVAL_MINUTES', '5'))
+AEP_DOWNLOAD_CHUNK_SIZE = int(os.environ.get('DOWNLOAD_CHUNK_KB', '128')) * 1024
+AEP_MAX_BATCH_URLS = 50
+AEP_YTDLP_WORKERS = int(os.environ.get('YTDLP_WORKERS', '8'))
+AEP_MAX_CONCURRENT_DL = int(os.environ.get('MAX_CONCURRENT_DL', '4'))
+AEP_BUSY_RETRY_AFTER_SECONDS = 30
+# Delegar el envío de archivos a nginx (X-Accel-Redirect) en producción
+AEP_USE_XACCEL = os.environ.get('USE_XACCEL', '').lower() in ('1', 'true', 'yes')
+AEP_XACCEL_PREFIX = os.environ.get('XACCEL_PREFIX', '/internal_downloads/')
 
 # Obtener rutas correctas para templates y static
 AEP_BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 AEP_TEMPLATE_DIR = os.path.join(AEP_BASE_DIR, 'templates')
 AEP_STATIC_DIR = os.path.join(AEP_BASE_DIR, 'static')
-AEP_DOWNLOAD_FOLDER = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'downloads')
+AEP_DOWNLOAD_FOLDER_ABS = os.path.abspath(AEP_DOWNLOAD_FOLDER)
+# Compartido por todos los workers para que cualquiera responda al sondeo
+AEP_JOBS_FOLDER = os.environ.get(
+    'JOBS_FOLDER',
+    os.path.join(tempfile.gettempdir(), 'youtube-downloader-jobs')
+)
 
 # Inicializar Flask
 app = Flask(
@@ -57,6 +83,7 @@ app = Flask(
 )
 app.config['SECRET_KEY'] = AEP_SECRET_KEY
 app.config['DOWNLOAD_FOLDER'] = AEP_DOWNLOAD_FOLDER
+app.config['DOWNLOAD_FOLDER_ABS'] = AEP_DOWNLOAD_FOLDER_ABS
 
 # Habilitar CORS para todas las rutas
 CORS(app)
@@ -65,13 +92,208 @@ app.config['MAX_CONTENT_LENGTH'] = AEP_MAX_CONTENT_LENGTH
 # Inicializar descargador
 downloader = AEPYouTubeDownloader(download_path=AEP_DOWNLOAD_FOLDER)
 
-# Inicializar servicio de limpieza
-cleanup_service = AEPFileCleanupService(
-    download_path=AEP_DOWNLOAD_FOLDER,
-    max_age_seconds=AEP_FILE_MAX_AGE_HOURS * 3600,
-    cleanup_interval=AEP_CLEANUP_INTERVAL_MINUTES * 60
+# Pool acotado para las llamadas bloqueantes de yt-dlp
+ytdlp_executor = ThreadPoolExecutor(
+    max_workers=AEP_YTDLP_WORKERS,
+    thread_name_prefix='ytdlp'
 )
 
+# Límite de descargas simultáneas (cada una lanza yt-dlp y ffmpeg)
+download_slots = threading.BoundedSemaphore(AEP_MAX_CONCURRENT_DL)
+active_downloads = 0
+active_downloads_lock = threading.Lock()
+
+# Estado de las descargas en segundo plano
+job_store = AEPDownloadJobStore(jobs_path=AEP_JOBS_FOLDER)
+
+# Inicializar servicio de limpieza
+cleanup_service = build_cleanup_service()
+
+
+def _set_attachment_header(response: Response, filename: str) -> None:
+    """
+    Añade la cabecera Content-Disposition para forzar la descarga.
+    
+    Los nombres con caracteres no ASCII se codifican según RFC 5987,
+    igual que hace send_file.
+    
+    Args:
+        response: Respuesta a modificar.
+        filename: Nombre del archivo que verá el usuario.
+    """
+    try:
+        filename.encode('ascii')
+        names = {'filename': filename}
+    except UnicodeEncodeError:
+        simple = unicodedata.normalize('NFKD', filename)
+        simple = simple.encode('ascii', 'ignore').decode('ascii')
+        quoted = quote(filename, safe="!#$&+-.^_`|~")
+        names = {'filename': simple, 'filename*': f"UTF-8''{quoted}"}
+    response.headers.set('Content-Disposition', 'attachment', **names)
+
+
+def _acquire_download_slot() -> bool:
+    """
+    Reserva un hueco de descarga sin bloquear.
+    
+    Returns:
+        True si se obtuvo el hueco, False si se alcanzó el límite.
+    """
+    global active_downloads
+    
+    if not download_slots.acquire(blocking=False):
+        return False
+    with active_downloads_lock:
+        active_downloads += 1
+    return True
+
+
+def _release_download_slot() -> None:
+    """
+    Libera un hueco de descarga reservado con _acquire_download_slot.
+    """
+    global active_downloads
+    
+    with active_downloads_lock:
+        active_downloads -= 1
+    download_slots.release()
+
+
+def _server_busy_response():
+    """
+    Respuesta 503 cuando no quedan huecos de descarga libres.
+    
+    Returns:
+        Tupla (respuesta JSON, código de estado, cabeceras).
+    """
+    return jsonify({
+        'success': False,
+        'error': 'Servidor ocupado, inténtalo de nuevo en unos segundos'
+    }), 503, {'Retry-After': str(AEP_BUSY_RETRY_AFTER_SECONDS)}
+
+
+def _finish_download_job(job_id: str, future: Future) -> None:
+    """
+    Guarda el resultado de una descarga en segundo plano y libera su hueco.
+    
+    Args:
+        job_id: Identificador del trabajo.
+        future: Future de la llamada a download_video.
+    """
+    try:
+        result = future.result()
+    except Exception as e:
+        logger.error(f"Error en el trabajo de descarga {job_id}: {str(e)}")
+        result = {
+            'success': False,
+            'error': str(e)
+        }
+    finally:
+        _release_download_slot()
+    
+    job_store.complete(job_id, result)
+
+
+def _send_download_file(
+    filepath: str,
+    filename: str,
+    delete_after_send: bool = False,
+    download_name: Optional[str] = None
+) -> Response:
+    """
+    Construye la respuesta que envía un archivo del directorio de descargas.
+    
+    Args:
+        filepath: Ruta absoluta del archivo.
+        filename: Nombre del archivo relativo al directorio de descargas.
+        delete_after_send: Eliminar el archivo al cerrar la respuesta si se
+            envía completo. No aplica con X-Accel-Redirect, donde nginx lee
+            el archivo después de que la aplicación responda.
+        download_name: Nombre que verá el usuario; por defecto el del
+            archivo.
+    
+    Returns:
+        Respuesta con el archivo como adjunto.
+    """
+    download_name = download_name or os.path.basename(filename)
+    
+    if AEP_USE_XACCEL:
+        # nginx sirve el archivo directamente desde la location interna
+        response = Response(status=200, mimetype='application/octet-stream')
+        response.headers['X-Accel-Redirect'] = AEP_XACCEL_PREFIX + quote(filename)
+        _set_attachment_header(response, download_name)
+        return response
+    
+    # wsgi.file_wrapper permite a gunicorn usar sendfile(2); si no está
+    # disponible se lee en bloques de AEP_DOWNLOAD_CHUNK_SIZE
+    file_stat = os.stat(filepath)
+    file = open(filepath, 'rb')
+    if request.range is not None:
+        # El wrapper de gunicorn no es seekable y el rango leería y
+        # descartaría todo lo anterior a su inicio; el de Werkzeug hace seek
+        body = FileWrapper(file, AEP_DOWNLOAD_CHUNK_SIZE)
+    else:
+        body = wrap_file(request.environ, file, AEP_DOWNLOAD_CHUNK_SIZE)
+    response = Response(
+        body,
+        mimetype='application/octet-stream',
+        direct_passthrough=True
+    )
+    response.headers['Content-Length'] = str(file_stat.st_size)
+    response.last_modified = file_stat.st_mtime
+    response.set_etag(f"{file_stat.st_mtime}-{file_stat.st_size}")
+    _set_attachment_header(response, download_name)
+    
+    # Soporte de Range (206) para reanudar descargas y buscar en el video;
+    # make_conditional solo anuncia Accept-Ranges si la petición trae Range
+    response.accept_ranges = 'bytes'
+    try:
+        response.make_conditional(
+            request,
+            accept_ranges=True,
+            complete_length=file_stat.st_size
+        )
+    except RequestedRangeNotSatisfiable:
+        file.close()
+        response = jsonify({
+            'success': False,
+            'error': 'Rango solicitado no válido'
+        })
+        response.status_code = 416
+        response.content_range = f"bytes */{file_stat.st_size}"
+        return response
+    
+    # Solo tras un envío completo: un 206 o 304 no entrega el archivo entero
+    if delete_after_send and response.status_code == 200:
+        # Con direct_passthrough Werkzeug entrega el iterable tal cual y no
+        # ejecuta los callbacks de cierre; se renuncia a sendfile en este caso
+        response.direct_passthrough = False
+        
+        # El servidor llama a close() aunque el cliente corte la conexión;
+        # solo se elimina si el cuerpo se llegó a recorrer entero
+        body = response.response
+        send_complete = False
+        
+        def track_send():
+            nonlocal send_complete
+            yield from body
+            send_complete = True
+        
+        response.response = track_send()
+        
+        @response.call_on_close
+        def remove_sent_file():
+            file.close()
+            if not send_complete:
+                return
+            try:
+                os.unlink(filepath)
+                logger.info(f"Archivo eliminado tras el envío: {download_name}")
+            except OSError:
+                pass
+    
+    return response
+
 
 @app.route('/')
 def index():
@@ -93,9 +315,10 @@ def get_video_info():
         JSON con la información del video.
     """
     try:
-        # Log para depuración
-        logger.info(f"Info Request Headers: {request.headers}")
-        logger.info(f"Info Request Body: {request.get_data(as_text=True)}")
+        # Log para depuración (solo se formatea si DEBUG está activo)
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Info Request Headers: %s", request.headers)
+            logger.debug("Info Request Body: %s", request.get_data(as_text=True))
 
         data = request.get_json(force=True, silent=True)
         
@@ -108,13 +331,13 @@ def get_video_info():
 
         url = data.get('url', '').strip()
         
-        if not url:
+        if not url or not extract_video_id(url):
             return jsonify({
                 'success': False,
                 'error': 'Por favor proporciona una URL válida'
             }), 400
         
-        info = downloader.get_video_info(url)
+        info = ytdlp_executor.submit(downloader.get_video_info, url).result()
         
         if info:
             return jsonify({
@@ -135,18 +358,71 @@ def get_video_info():
         }), 500
 
 
+@app.route('/api/info/batch', methods=['POST'])
+def get_video_info_batch():
+    """
+    Obtiene información de varios videos de YouTube en paralelo.
+    
+    Returns:
+        JSON con la información de cada video en el orden recibido.
+    """
+    try:
+        data = request.get_json(force=True, silent=True)
+        urls = data.get('urls') if isinstance(data, dict) else None
+        
+        if not isinstance(urls, list) or not urls:
+            return jsonify({
+                'success': False,
+                'error': 'Por favor proporciona una lista de URLs'
+            }), 400
+        
+        if len(urls) > AEP_MAX_BATCH_URLS:
+            return jsonify({
+                'success': False,
+                'error': f'Máximo {AEP_MAX_BATCH_URLS} URLs por petición'
+            }), 400
+        
+        if not all(isinstance(url, str) and extract_video_id(url) for url in urls):
+            return jsonify({
+                'success': False,
+                'error': 'Todas las URLs deben ser válidas'
+            }), 400
+        
+        # Se llama desde el hilo de la petición: las extracciones ocupan
+        # huecos de ytdlp_executor y esperarlas desde uno de ellos podría
+        # bloquear el pool
+        infos = downloader.get_video_info_batch(
+            [url.strip() for url in urls],
+            ytdlp_executor
+        )
+        
+        return jsonify({
+            'success': True,
+            'results': infos
+        })
+        
+    except Exception as e:
+        logger.error(f"Error en get_video_info_batch: {str(e)}")
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+
 @app.route('/api/download', methods=['POST'])
 def download_video():
     """
-    Descarga un video de YouTube.
+    Inicia la descarga de un video de YouTube en segundo plano.
     
     Returns:
-        JSON con el resultado de la descarga.
+        JSON con el identificador del trabajo (202) para consultar su estado
+        en /api/download/<job_id>.
     """
     try:
-        # Log para depuración
-        logger.info(f"Download Request Headers: {request.headers}")
-        logger.info(f"Download Request Body: {request.get_data(as_text=True)}")
+        # Log para depuración (solo se formatea si DEBUG está activo)
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Download Request Headers: %s", request.headers)
+            logger.debug("Download Request Body: %s", request.get_data(as_text=True))
 
         data = request.get_json(force=True, silent=True)
         
@@ -160,18 +436,34 @@ def download_video():
         url = data.get('url', '').strip()
         format_id = data.get('format', 'bestvideo+bestaudio/best')
         
-        if not url:
+        if not url or not extract_video_id(url):
             return jsonify({
                 'success': False,
                 'error': 'Por favor proporciona una URL válida'
             }), 400
         
-        result = downloader.download_video(url, format_id)
+        if not _acquire_download_slot():
+            return _server_busy_response()
         
-        if result['success']:
-            return jsonify(result)
-        else:
-            return jsonify(result), 400
+        job_store.evict_expired()
+        
+        try:
+            job_id = job_store.create()
+            future = ytdlp_executor.submit(
+                downloader.download_video, url, format_id
+            )
+        except Exception:
+            _release_download_slot()
+            raise
+        
+        future.add_done_callback(
+            lambda done: _finish_download_job(job_id, done)
+        )
+        
+        return jsonify({
+            'success': True,
+            'job_id': job_id
+        }), 202, {'Location': url_for('get_download_status', job_id=job_id)}
             
     except Exception as e:
         logger.error(f"Error en download_video: {str(e)}")
@@ -181,11 +473,43 @@ def download_video():
         }), 500
 
 
+@app.route('/api/download/<job_id>')
+def get_download_status(job_id: str):
+    """
+    Consulta el estado de una descarga en segundo plano.
+    
+    Args:
+        job_id: Identificador devuelto por /api/download.
+    
+    Returns:
+        JSON con 'done' y, al terminar, el resultado de la descarga.
+    """
+    job = job_store.get(job_id)
+    
+    if job is None:
+        return jsonify({
+            'success': False,
+            'error': 'Trabajo no encontrado'
+        }), 404
+    
+    if not job['done']:
+        return jsonify({
+            'success': True,
+            'done': False
+        }), 202
+    
+    result = job['result']
+    return jsonify({'done': True, **result}), 200 if result['success'] else 400
+
+
 @app.route('/api/file/<path:filename>')
 def download_file(filename: str):
     """
     Envía el archivo descargado al usuario.
     
+    Con ?oneshot=1 el archivo se elimina en cuanto se termina de enviar,
+    en lugar de esperar a la limpieza automática.
+    
     Args:
         filename: Nombre del archivo a descargar.
     
@@ -197,14 +521,11 @@ def download_file(filename: str):
         from urllib.parse import unquote
         decoded_filename = unquote(filename)
         
-        # Construir la ruta completa
-        filepath = os.path.join(app.config['DOWNLOAD_FOLDER'], decoded_filename)
-        
-        # Verificar que el archivo existe y está dentro del directorio de descargas
-        filepath = os.path.abspath(filepath)
-        download_folder = os.path.abspath(app.config['DOWNLOAD_FOLDER'])
+        # Construir la ruta completa; safe_join rechaza rutas absolutas y
+        # componentes '..' que saldrían del directorio de descargas
+        filepath = safe_join(app.config['DOWNLOAD_FOLDER_ABS'], decoded_filename)
         
-        if not filepath.startswith(download_folder):
+        if filepath is None:
             return jsonify({
                 'success': False,
                 'error': 'Acceso no autorizado'
@@ -217,10 +538,10 @@ def download_file(filename: str):
                 'error': 'Archivo no encontrado'
             }), 404
         
-        return send_file(
+        return _send_download_file(
             filepath,
-            as_attachment=True,
-            download_name=decoded_filename
+            decoded_filename,
+            delete_after_send=request.args.get('oneshot') == '1'
         )
         
     except Exception as e:
@@ -231,6 +552,128 @@ def download_file(filename: str):
         }), 500
 
 
+@app.route('/api/stream')
+def stream_video():
+    """
+    Envía el video al usuario a medida que yt-dlp lo descarga.
+    
+    Los formatos que requieren fusión con ffmpeg no pueden escribirse por
+    stdout; en ese caso se descarga a disco y se envía el archivo.
+    
+    Returns:
+        Video como adjunto o JSON con el error.
+    """
+    try:
+        url = request.args.get('url', '').strip()
+        format_id = request.args.get('format', AEP_STREAM_FORMAT)
+        
+        if not url or not extract_video_id(url):
+            return jsonify({
+                'success': False,
+                'error': 'Por favor proporciona una URL válida'
+            }), 400
+        
+        if not _acquire_download_slot():
+            return _server_busy_response()
+        
+        # El hueco se libera aquí salvo que lo herede la respuesta en stream
+        slot_handed_off = False
+        try:
+            if '+' in format_id:
+                # Nombre propio de la petición: yt-dlp reutilizaría el archivo
+                # de otra descarga del mismo video y se borraría al enviarlo
+                send_token = uuid.uuid4().hex
+                result = ytdlp_executor.submit(
+                    downloader.download_video,
+                    url,
+                    format_id,
+                    f'%(title)s.{send_token}.%(ext)s'
+                ).result()
+                if not result['success']:
+                    return jsonify(result), 400
+                # El archivo se generó solo para este envío
+                return _send_download_file(
+                    result['filepath'],
+                    result['filename'],
+                    delete_after_send=True,
+                    download_name=result['filename'].replace(
+                        f'.{send_token}', '', 1
+                    )
+                )
+            
+            info = ytdlp_executor.submit(downloader.get_video_info, url).result()
+            title = info['title'] if info else extract_video_id(url)
+            
+            proc = downloader.open_stream(url, format_id)
+            
+            # Leer el primer bloque antes de responder para detectar errores
+            first_chunk = proc.stdout.read(AEP_DOWNLOAD_CHUNK_SIZE)
+            if not first_chunk:
+                error = proc.stderr.read().decode('utf-8', 'replace').strip()
+                proc.wait()
+                logger.error(f"Error en stream de yt-dlp: {error}")
+                return jsonify({
+                    'success': False,
+                    'error': error or 'No se pudo descargar el video'
+                }), 400
+            
+            def generate():
+                yield first_chunk
+                yield from iter(
+                    lambda: proc.stdout.read(AEP_DOWNLOAD_CHUNK_SIZE), b''
+                )
+            
+            response = Response(generate(), mimetype='video/mp4')
+            safe_title = re.sub(r'[\\/:*?"<>|\x00-\x1f]', '_', title).strip()
+            _set_attachment_header(response, f"{safe_title or 'video'}.mp4")
+            
+            @response.call_on_close
+            def reap_process():
+                # Terminar yt-dlp si el cliente cortó la conexión y evitar zombies
+                if proc.poll() is None:
+                    proc.kill()
+                proc.stdout.close()
+                proc.stderr.close()
+                proc.wait()
+                _release_download_slot()
+            
+            slot_handed_off = True
+            return response
+        finally:
+            if not slot_handed_off:
+                _release_download_slot()
+        
+    except Exception as e:
+        logger.error(f"Error en stream_video: {str(e)}")
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+
+@app.route('/api/stats')
+def get_stats():
+    """
+    Devuelve el estado de carga del servidor y del directorio de descargas.
+    
+    Returns:
+        JSON con descargas activas y uso de disco.
+    """
+    file_count, total_size = cleanup_service.stats()
+    with active_downloads_lock:
+        current_downloads = active_downloads
+    
+    return jsonify({
+        'success': True,
+        'stats': {
+            'active_downloads': current_downloads,
+            'max_concurrent_downloads': AEP_MAX_CONCURRENT_DL,
+            'file_count': file_count,
+            'total_size': total_size
+        }
+    })
+
+
 @app.errorhandler(404)
 def not_found(error):
     """
@@ -283,3 +726,4 @@ if __name__ == '__main__':
     finally:
         # Detener servicio de limpieza al cerrar
         cleanup_service.stop()
+        ytdlp_executor.shutdown(wait=False)
@@ -0,0 +1,32 @@
+"""
+Configuración compartida por la aplicación y por Gunicorn.
+
+No importa Flask: gunicorn.conf.py la usa en el proceso maestro, que no
+debe cargar la aplicación antes de crear los workers.
+"""
+import os
+from dotenv import load_dotenv
+from file_cleanup import AEPFileCleanupService
+
+
+# Cargar variables de entorno
+load_dotenv()
+
+# Constantes de configuración
+AEP_FILE_MAX_AGE_HOURS = int(os.environ.get('FILE_MAX_AGE_HOURS', '1'))
+AEP_CLEANUP_INTERVAL_MINUTES = int(os.environ.get('CLEANUP_INTERVAL_MINUTES', '5'))
+AEP_DOWNLOAD_FOLDER = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'downloads')
+
+
+def build_cleanup_service() -> AEPFileCleanupService:
+    """
+    Crea el servicio de limpieza del directorio de descargas.
+    
+    Returns:
+        Servicio configurado según el entorno, sin iniciar.
+    """
+    return AEPFileCleanupService(
+        download_path=AEP_DOWNLOAD_FOLDER,
+        max_age_seconds=AEP_FILE_MAX_AGE_HOURS * 3600,
+        cleanup_interval=AEP_CLEANUP_INTERVAL_MINUTES * 60
+    )
@@ -0,0 +1,181 @@
+"""
+Módulo para el seguimiento de descargas en segundo plano.
+"""
+import os
+import re
+import json
+import time
+import uuid
+import logging
+from typing import Dict, Optional
+
+
+logger = logging.getLogger(__name__)
+
+# Constantes
+AEP_JOB_TTL_SECONDS = 3600  # 1 hora
+AEP_JOB_ID_RE = re.compile(r'^[0-9a-f]{32}$')
+AEP_ORPHANED_JOB_ERROR = 'La descarga se interrumpió en el servidor, inténtalo de nuevo'
+
+
+def _is_process_alive(pid: int) -> bool:
+    """
+    Comprueba si sigue vivo el proceso con ese PID.
+    
+    Args:
+        pid: Identificador del proceso.
+    
+    Returns:
+        False solo si el proceso seguro que ya no existe.
+    """
+    if os.name == 'nt':
+        # En Windows os.kill termina el proceso en lugar de comprobarlo
+        return True
+    
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class AEPDownloadJobStore:
+    """
+    Almacén del estado de los trabajos de descarga.
+    
+    Cada trabajo se guarda como un archivo JSON para que cualquier proceso
+    worker de Gunicorn pueda consultar un trabajo lanzado por otro. Los
+    trabajos pendientes guardan el PID del worker que los ejecuta: si ese
+    proceso muere (timeout, HUP, OOM) el trabajo se da por fallido.
+    
+    Attributes:
+        jobs_path: Directorio donde se guardan los trabajos.
+        ttl_seconds: Tiempo que se conserva un trabajo desde su última
+            actualización.
+    """
+    
+    def __init__(
+        self,
+        jobs_path: str,
+        ttl_seconds: int = AEP_JOB_TTL_SECONDS
+    ) -> None:
+        """
+        Inicializa el almacén de trabajos.
+        
+        Args:
+            jobs_path: Directorio donde se guardan los trabajos.
+            ttl_seconds: Tiempo de vida de cada trabajo.
+        """
+        self.jobs_path = jobs_path
+        self.ttl_seconds = ttl_seconds
+        os.makedirs(self.jobs_path, exist_ok=True)
+    
+    def create(self) -> str:
+        """
+        Registra un trabajo nuevo pendiente.
+        
+        Returns:
+            Identificador del trabajo.
+        """
+        job_id = uuid.uuid4().hex
+        self._write(job_id, {'done': False, 'pid': os.getpid()})
+        return job_id
+    
+    def complete(self, job_id: str, result: Dict) -> None:
+        """
+        Marca un trabajo como terminado con su resultado.
+        
+        Args:
+            job_id: Identificador del trabajo.
+            result: Resultado de la descarga.
+        """
+        self._write(job_id, {'done': True, 'result': result})
+    
+    def get(self, job_id: str) -> Optional[Dict]:
+        """
+        Obtiene el estado de un trabajo.
+        
+        Args:
+            job_id: Identificador del trabajo.
+        
+        Returns:
+            Diccionario con 'done' y, si terminó, 'result'; None si no existe.
+        """
+        if not AEP_JOB_ID_RE.match(job_id):
+            return None
+        
+        try:
+            with open(self._job_file(job_id), 'r', encoding='utf-8') as f:
+                job = json.load(f)
+        except (OSError, ValueError):
+            return None
+        
+        pid = job.get('pid')
+        if not job['done'] and pid is not None and not _is_process_alive(pid):
+            logger.warning(
+                f"Trabajo {job_id} huérfano: el worker {pid} ya no existe"
+            )
+            result = {
+                'success': False,
+                'error': AEP_ORPHANED_JOB_ERROR
+            }
+            self.complete(job_id, result)
+            job = {'done': True, 'result': result}
+        
+        return job
+    
+    def evict_expired(self) -> int:
+        """
+        Elimina los trabajos que no se actualizan desde hace ttl_seconds.
+        
+        Returns:
+            Número de trabajos eliminados.
+        """
+        current_time = time.time()
+        evicted_count = 0
+        
+        try:
+            with os.scandir(self.jobs_path) as entries:
+                for entry in entries:
+                    if not entry.is_file(follow_symlinks=False):
+                        continue
+                    
+                    age = current_time - entry.stat(follow_symlinks=False).st_mtime
+                    if age > self.ttl_seconds:
+                        try:
+                            os.unlink(entry.path)
+                            evicted_count += 1
+                        except OSError:
+                            pass
+        except Exception as e:
+            logger.error(f"Error al limpiar trabajos caducados: {str(e)}")
+        
+        return evicted_count
+    
+    def _job_file(self, job_id: str) -> str:
+        """
+        Obtiene la ruta del archivo de un trabajo.
+        
+        Args:
+            job_id: Identificador del trabajo.
+        
+        Returns:
+            Ruta del archivo JSON.
+        """
+        return os.path.join(self.jobs_path, f"{job_id}.json")
+    
+    def _write(self, job_id: str, state: Dict) -> None:
+        """
+        Guarda el estado de un trabajo de forma atómica.
+        
+        Args:
+            job_id: Identificador del trabajo.
+            state: Estado a guardar.
+        """
+        filepath = self._job_file(job_id)
+        tmp_path = f"{filepath}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(state, f)
+        os.replace(tmp_path, filepath)
@@ -3,9 +3,22 @@ Módulo para la limpieza automática de archivos descargados.
 """
 import os
 import time
+import heapq
 import threading
 import logging
-from typing import Optional
+from typing import List, Optional, Tuple
+
+try:
+    from inotify_simple import INotify, flags as inotify_flags
+    AEP_HAS_INOTIFY = True
+except ImportError:
+    AEP_HAS_INOTIFY = False
+
+try:
+    import liburing
+    AEP_HAS_LIBURING = True
+except ImportError:
+    AEP_HAS_LIBURING = False
 
 
 logger = logging.getLogger(__name__)
@@ -13,18 +26,84 @@ logger = logging.getLogger(__name__)
 # Constantes
 AEP_CLEANUP_INTERVAL_SECONDS = 300  # 5 minutos
 AEP_FILE_MAX_AGE_SECONDS = 3600  # 1 hora
+AEP_INOTIFY_READ_TIMEOUT_MS = 1000
+AEP_IO_URING_ENTRIES = 64
+# Con menos archivos un unlink por archivo cuesta menos que un envío al anillo
+AEP_IO_URING_MIN_BATCH = 4
+
+# Recorrer y borrar relativo a un descriptor del directorio (no en Windows)
+AEP_HAS_DIR_FD = (
+    os.scandir in os.supports_fd
+    and os.unlink in os.supports_dir_fd
+)
+
+
+def _unlink_with_io_uring(
+    ring: "liburing.Ring",
+    names: List[str],
+    dir_fd: int
+) -> List[Optional[OSError]]:
+    """
+    Elimina varios archivos con io_uring (IORING_OP_UNLINKAT).
+    
+    Cada lote de hasta AEP_IO_URING_ENTRIES archivos se envía con una sola
+    llamada al kernel en lugar de un unlink por archivo.
+    
+    Args:
+        ring: Anillo de io_uring ya inicializado.
+        names: Nombres de los archivos relativos a dir_fd.
+        dir_fd: Descriptor del directorio que los contiene.
+    
+    Returns:
+        Lista con None por cada archivo eliminado o el error producido,
+        en el mismo orden que names.
+    """
+    results: List[Optional[OSError]] = [None] * len(names)
+    cqe = liburing.Cqe()
+    
+    for start in range(0, len(names), AEP_IO_URING_ENTRIES):
+        batch = names[start:start + AEP_IO_URING_ENTRIES]
+        for index, name in enumerate(batch, start):
+            sqe = liburing.io_uring_get_sqe(ring)
+            liburing.io_uring_prep_unlink(sqe, name, 0, dir_fd)
+            sqe.user_data = index
+        
+        liburing.io_uring_submit(ring)
+        liburing.io_uring_wait_cqe_nr(ring, cqe, len(batch))
+        
+        ready = liburing.io_uring_cq_ready(ring)
+        for i in range(ready):
+            entry = cqe[i]
+            index = entry.user_data
+            try:
+                # res negativo se convierte en la excepción de su errno
+                entry.res
+            except OSError as e:
+                results[index] = e
+        liburing.io_uring_cq_advance(ring, ready)
+    
+    return results
 
 
 class AEPFileCleanupService:
     """
     Servicio para limpiar archivos antiguos automáticamente.
     
+    En Linux, si inotify está disponible, cada archivo nuevo programa su
+    propia expiración y se elimina en cuanto caduca, sin recorrer el
+    directorio periódicamente. En otro caso, o si inotify falla, se usa el
+    sondeo cada cleanup_interval segundos.
+    
     Attributes:
         download_path: Ruta del directorio de descargas.
         max_age_seconds: Edad máxima de los archivos en segundos.
         cleanup_interval: Intervalo entre limpiezas en segundos.
         _running: Estado del servicio.
         _thread: Hilo de ejecución del servicio.
+        _watcher: Hilo que recibe los eventos de inotify.
+        _expirations: Heap de (instante de expiración, ruta).
+        _io_uring_ring: Anillo de io_uring reutilizado mientras el servicio
+            está activo.
     """
     
     def __init__(
@@ -46,6 +125,12 @@ class AEPFileCleanupService:
         self.cleanup_interval = cleanup_interval
         self._running = False
         self._thread: Optional[threading.Thread] = None
+        self._watcher: Optional[threading.Thread] = None
+        self._expirations: List[Tuple[float, str]] = []
+        self._condition = threading.Condition()
+        self._io_uring_available = AEP_HAS_LIBURING
+        self._io_uring_ring: Optional["liburing.Ring"] = None
+        self._io_uring_lock = threading.Lock()
     
     def start(self) -> None:
         """
@@ -56,13 +141,30 @@ class AEPFileCleanupService:
             return
         
         self._running = True
+        inotify = self._open_inotify() if AEP_HAS_INOTIFY else None
+        
+        if inotify is not None:
+            # Reconciliar después de vigilar: un archivo cerrado entre medias
+            # llega como evento en lugar de perderse
+            self._schedule_existing_files()
+            self._watcher = threading.Thread(
+                target=self._watch_loop,
+                args=(inotify,),
+                daemon=True
+            )
+            self._watcher.start()
+            target = self._expiration_loop
+        else:
+            target = self._cleanup_loop
+        
         self._thread = threading.Thread(
-            target=self._cleanup_loop,
+            target=target,
             daemon=True
         )
         self._thread.start()
         logger.info(
-            f"Servicio de limpieza iniciado. "
+            f"Servicio de limpieza iniciado "
+            f"({'inotify' if inotify is not None else 'sondeo'}). "
             f"Archivos se eliminarán después de {self.max_age_seconds}s"
         )
     
@@ -70,14 +172,173 @@ class AEPFileCleanupService:
         """
         Detiene el servicio de limpieza.
         """
-        self._running = False
+        with self._condition:
+            self._running = False
+            self._condition.notify_all()
+        if self._watcher:
+            self._watcher.join(timeout=5)
         if self._thread:
             self._thread.join(timeout=5)
+        self._close_io_uring()
         logger.info("Servicio de limpieza detenido")
     
+    def schedule(self, filepath: str) -> None:
+        """
+        Programa la eliminación de un archivo según su fecha de modificación.
+        
+        Args:
+            filepath: Ruta del archivo a programar.
+        """
+        try:
+            mtime = os.stat(filepath, follow_symlinks=False).st_mtime
+        except OSError:
+            return
+        
+        with self._condition:
+            heapq.heappush(
+                self._expirations,
+                (mtime + self.max_age_seconds, filepath)
+            )
+            self._condition.notify()
+    
+    def _schedule_existing_files(self) -> None:
+        """
+        Programa la expiración de los archivos que ya estaban en el directorio.
+        """
+        if not os.path.exists(self.download_path):
+            return
+        
+        try:
+            with os.scandir(self.download_path) as entries:
+                for entry in entries:
+                    if entry.is_file(follow_symlinks=False):
+                        self.schedule(entry.path)
+        except Exception as e:
+            logger.error(f"Error al reconciliar archivos existentes: {str(e)}")
+    
+    def _open_inotify(self) -> Optional["INotify"]:
+        """
+        Crea la instancia de inotify y vigila el directorio de descargas.
+        
+        Returns:
+            Instancia lista para leer eventos o None si inotify no se puede
+            usar (p. ej. EMFILE al agotar max_user_instances).
+        """
+        os.makedirs(self.download_path, exist_ok=True)
+        inotify = None
+        try:
+            inotify = INotify()
+            inotify.add_watch(
+                self.download_path,
+                inotify_flags.CLOSE_WRITE | inotify_flags.MOVED_TO
+            )
+            return inotify
+        except OSError as e:
+            logger.warning(f"inotify no disponible, se usará el sondeo: {str(e)}")
+            if inotify is not None:
+                inotify.close()
+            return None
+    
+    def _watch_loop(self, inotify: "INotify") -> None:
+        """
+        Escucha los eventos de inotify y programa cada archivo terminado.
+        
+        Si el observador falla, el hilo pasa a la limpieza por sondeo para
+        que los archivos nuevos se sigan eliminando.
+        
+        Args:
+            inotify: Instancia que ya vigila el directorio de descargas.
+        """
+        try:
+            while self._running:
+                for event in inotify.read(timeout=AEP_INOTIFY_READ_TIMEOUT_MS):
+                    if event.name:
+                        self.schedule(
+                            os.path.join(self.download_path, event.name)
+                        )
+        except Exception as e:
+            logger.error(
+                f"Error en el observador de inotify, se usará el sondeo: {str(e)}"
+            )
+        finally:
+            inotify.close()
+        
+        # Solo se sigue aquí si el observador falló con el servicio activo
+        if self._running:
+            self._cleanup_loop()
+    
+    def _expiration_loop(self) -> None:
+        """
+        Elimina cada archivo cuando llega su instante de expiración.
+        """
+        while True:
+            with self._condition:
+                while self._running and (
+                    not self._expirations
+                    or self._expirations[0][0] > time.time()
+                ):
+                    timeout = (
+                        self._expirations[0][0] - time.time()
+                        if self._expirations else None
+                    )
+                    self._condition.wait(timeout)
+                
+                if not self._running:
+                    return
+                
+                # Sacar todos los vencidos para borrarlos en un solo lote
+                now = time.time()
+                due = set()
+                while self._expirations and self._expirations[0][0] <= now:
+                    due.add(heapq.heappop(self._expirations)[1])
+            
+            self._remove_expired(sorted(due))
+    
+    def _remove_expired(self, filepaths: List[str]) -> None:
+        """
+        Elimina los archivos que siguen superando la edad máxima.
+        
+        Un archivo pudo reescribirse después de programarse; en ese caso
+        existe otra entrada más reciente en el heap y no se elimina aún.
+        
+        Args:
+            filepaths: Rutas de archivos del directorio de descargas.
+        """
+        current_time = time.time()
+        dir_fd: Optional[int] = None
+        expired: List[Tuple[str, str, float]] = []
+        
+        try:
+            if AEP_HAS_DIR_FD:
+                dir_fd = os.open(
+                    self.download_path,
+                    os.O_RDONLY | os.O_DIRECTORY
+                )
+            
+            for filepath in filepaths:
+                name = os.path.basename(filepath)
+                path = name if dir_fd is not None else filepath
+                try:
+                    file_age = current_time - os.stat(
+                        path, dir_fd=dir_fd, follow_symlinks=False
+                    ).st_mtime
+                except OSError:
+                    continue
+                
+                if file_age > self.max_age_seconds:
+                    expired.append((path, name, file_age))
+            
+            self._delete_expired(expired, dir_fd)
+        
+        except Exception as e:
+            logger.error(f"Error al eliminar archivos caducados: {str(e)}")
+        finally:
+            if dir_fd is not None:
+                os.close(dir_fd)
+    
     def _cleanup_loop(self) -> None:
         """
-        Bucle principal del servicio de limpieza.
+        Bucle de sondeo usado cuando inotify no está disponible.
         """
         while self._running:
             try:
@@ -86,7 +347,9 @@ class AEPFileCleanupService:
                 logger.error(f"Error en limpieza automática: {str(e)}")
             
             # Esperar antes de la próxima limpieza
-            time.sleep(self.cleanup_interval)
+            with self._condition:
+                if self._running:
+                    self._condition.wait(self.cleanup_interval)
     
     def cleanup_old_files(self) -> int:
         """
@@ -100,31 +363,36 @@ class AEPFileCleanupService:
         
         current_time = time.time()
         deleted_count = 0
+        dir_fd: Optional[int] = None
+        expired: List[Tuple[str, str, float]] = []
         
         try:
-            for filename in os.listdir(self.download_path):
-                filepath = os.path.join(self.download_path, filename)
-                
-                # Solo procesar archivos, no directorios
-                if not os.path.isfile(filepath):
-                    continue
-                
-                # Obtener tiempo de modificación del archivo
-                file_age = current_time - os.path.getmtime(filepath)
-                
-                # Eliminar si es más antiguo que max_age_seconds
-                if file_age > self.max_age_seconds:
-                    try:
-                        os.remove(filepath)
-                        deleted_count += 1
-                        logger.info(
-                            f"Archivo eliminado: {filename} "
-                            f"(edad: {int(file_age)}s)"
-                        )
-                    except OSError as e:
-                        logger.error(
-                            f"Error al eliminar {filename}: {str(e)}"
-                        )
+            # Con un descriptor del directorio, entry.path es solo el nombre y
+            # cada unlink evita resolver de nuevo la ruta completa
+            if AEP_HAS_DIR_FD:
+                dir_fd = os.open(
+                    self.download_path,
+                    os.O_RDONLY | os.O_DIRECTORY
+                )
+            
+            with os.scandir(
+                dir_fd if dir_fd is not None else self.download_path
+            ) as entries:
+                for entry in entries:
+                    # Solo procesar archivos, no directorios
+                    if not entry.is_file(follow_symlinks=False):
+                        continue
+                    
+                    # Reutilizar el stat de la entrada (una sola llamada)
+                    file_age = current_time - entry.stat(
+                        follow_symlinks=False
+                    ).st_mtime
+                    
+                    # Eliminar si es más antiguo que max_age_seconds
+                    if file_age > self.max_age_seconds:
+                        expired.append((entry.path, entry.name, file_age))
+            
+            deleted_count = self._delete_expired(expired, dir_fd)
             
             if deleted_count > 0:
                 logger.info(
@@ -133,30 +401,142 @@ class AEPFileCleanupService:
         
         except Exception as e:
             logger.error(f"Error durante la limpieza: {str(e)}")
+        finally:
+            if dir_fd is not None:
+                os.close(dir_fd)
         
         return deleted_count
     
-    def get_directory_size(self) -> int:
+    def _delete_expired(
+        self,
+        expired: List[Tuple[str, str, float]],
+        dir_fd: Optional[int]
+    ) -> int:
         """
-        Obtiene el tamaño total del directorio de descargas.
+        Elimina en lote los archivos caducados y registra cada resultado.
+        
+        Args:
+            expired: Tuplas (ruta, nombre, edad en segundos); la ruta es
+                relativa a dir_fd si se indica.
+            dir_fd: Descriptor del directorio o None para rutas completas.
         
         Returns:
-            Tamaño en bytes.
+            Número de archivos eliminados.
+        """
+        deleted_count = 0
+        errors = self._unlink_files([path for path, _, _ in expired], dir_fd)
+        for (_, name, file_age), error in zip(expired, errors):
+            if error is None:
+                deleted_count += 1
+                logger.info(
+                    f"Archivo eliminado: {name} "
+                    f"(edad: {int(file_age)}s)"
+                )
+            else:
+                logger.error(f"Error al eliminar {name}: {str(error)}")
+        return deleted_count
+    
+    def _unlink_files(
+        self,
+        paths: List[str],
+        dir_fd: Optional[int]
+    ) -> List[Optional[OSError]]:
+        """
+        Elimina varios archivos, en lote con io_uring si está disponible.
+        
+        Args:
+            paths: Rutas de los archivos (relativas a dir_fd si se indica).
+            dir_fd: Descriptor del directorio o None para rutas completas.
+        
+        Returns:
+            Lista con None por cada archivo eliminado o el error producido.
         """
+        if (
+            len(paths) >= AEP_IO_URING_MIN_BATCH
+            and dir_fd is not None
+            and self._io_uring_available
+        ):
+            try:
+                with self._io_uring_lock:
+                    return _unlink_with_io_uring(
+                        self._get_io_uring(), paths, dir_fd
+                    )
+            except OSError as e:
+                # Kernel antiguo o io_uring bloqueado (p. ej. por seccomp)
+                logger.warning(
+                    f"io_uring no disponible, se usará unlink: {str(e)}"
+                )
+                self._io_uring_available = False
+        
+        errors: List[Optional[OSError]] = []
+        for path in paths:
+            try:
+                os.unlink(path, dir_fd=dir_fd)
+                errors.append(None)
+            except OSError as e:
+                errors.append(e)
+        return errors
+    
+    def _get_io_uring(self) -> "liburing.Ring":
+        """
+        Obtiene el anillo de io_uring, creándolo la primera vez.
+        
+        Debe llamarse con _io_uring_lock adquirido.
+        
+        Returns:
+            Anillo inicializado.
+        
+        Raises:
+            OSError: Si el kernel no permite crear el anillo.
+        """
+        if self._io_uring_ring is None:
+            ring = liburing.Ring()
+            liburing.io_uring_queue_init(AEP_IO_URING_ENTRIES, ring)
+            self._io_uring_ring = ring
+        return self._io_uring_ring
+    
+    def _close_io_uring(self) -> None:
+        """
+        Libera el anillo de io_uring si se llegó a crear.
+        """
+        with self._io_uring_lock:
+            if self._io_uring_ring is not None:
+                liburing.io_uring_queue_exit(self._io_uring_ring)
+                self._io_uring_ring = None
+    
+    def stats(self) -> Tuple[int, int]:
+        """
+        Obtiene el número de archivos y el tamaño total del directorio
+        recorriéndolo una sola vez.
+        
+        Returns:
+            Tupla (número de archivos, tamaño en bytes).
+        """
+        file_count = 0
         total_size = 0
         
         if not os.path.exists(self.download_path):
-            return 0
+            return 0, 0
         
         try:
-            for filename in os.listdir(self.download_path):
-                filepath = os.path.join(self.download_path, filename)
-                if os.path.isfile(filepath):
-                    total_size += os.path.getsize(filepath)
+            with os.scandir(self.download_path) as entries:
+                for entry in entries:
+                    if entry.is_file(follow_symlinks=False):
+                        file_count += 1
+                        total_size += entry.stat(follow_symlinks=False).st_size
         except Exception as e:
-            logger.error(f"Error al calcular tamaño del directorio: {str(e)}")
+            logger.error(f"Error al recorrer el directorio: {str(e)}")
         
-        return total_size
+        return file_count, total_size
+    
+    def get_directory_size(self) -> int:
+        """
+        Obtiene el tamaño total del directorio de descargas.
+        
+        Returns:
+            Tamaño en bytes.
+        """
+        return self.stats()[1]
     
     def get_file_count(self) -> int:
         """
@@ -165,14 +545,4 @@ class AEPFileCleanupService:
         Returns:
             Número de archivos.
         """
-        if not os.path.exists(self.download_path):
-            return 0
-        
-        try:
-            return len([
-                f for f in os.listdir(self.download_path)
-                if os.path.isfile(os.path.join(self.download_path, f))
-            ])
-        except Exception as e:
-            logger.error(f"Error al contar archivos: {str(e)}")
-            return 0
+        return self.stats()[0]
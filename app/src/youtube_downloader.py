@@ -2,25 +2,138 @@
 Módulo para descargar videos de YouTube utilizando yt-dlp.
 """
 import os
+import re
 import logging
 import json
 import time
+import threading
 import traceback
-from typing import Dict, Optional
+from collections import OrderedDict
+from concurrent.futures import Executor
+from contextlib import contextmanager
+from types import MappingProxyType
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
 import yt_dlp
+from yt_dlp.networking.impersonate import ImpersonateTarget
 import shutil
+import subprocess
+import sys
+from cachetools import TTLCache
 
 
-# Configuración de logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
 logger = logging.getLogger(__name__)
 
 # Constantes
 AEP_MAX_FILESIZE_MB = 500
 AEP_DEFAULT_DOWNLOAD_PATH = os.path.join(os.getcwd(), 'downloads')
+AEP_COOKIES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'cookies.txt')
+AEP_MIN_COOKIES_SIZE = 100  # Archivo con contenido mínimo
+AEP_INFO_CACHE_MAXSIZE = 512
+AEP_INFO_CACHE_TTL_SECONDS = 600  # 10 minutos
+AEP_BATCH_SOCKET_TIMEOUT = 10
+AEP_BATCH_RETRIES = 2
+AEP_STREAM_FORMAT = 'best[ext=mp4]/best'
+AEP_YDL_POOL_SIZE = 5  # Información + 4 formatos de descarga
+AEP_IMPERSONATE_TARGET = 'chrome'
+AEP_CONCURRENT_FRAGMENTS = 16
+AEP_ARIA2C_ARGS = ['-x', '16', '-s', '16', '-k', '1M']
+
+# URL de video de YouTube; el grupo 1 es el ID del video
+_YT_URL_RE = re.compile(
+    r'^(?:https?://)?(?:(?:www|m|music)\.)?'
+    r'(?:youtube\.com/(?:watch\?(?:[^#]*&)?v=|shorts/|embed/|live/)|youtu\.be/)'
+    r'([\w-]{11})(?![\w-])'
+)
+
+
+def extract_video_id(url: str) -> Optional[str]:
+    """
+    Extrae el ID de un video a partir de su URL de YouTube.
+    
+    Args:
+        url: URL del video de YouTube.
+    
+    Returns:
+        ID del video o None si la URL no es de un video de YouTube.
+    """
+    match = _YT_URL_RE.match(url.strip())
+    return match.group(1) if match else None
+
+
+def _detect_impersonate_target() -> Optional[ImpersonateTarget]:
+    """
+    Comprueba una sola vez si yt-dlp puede suplantar a un navegador.
+    
+    Requiere curl_cffi en una versión soportada por yt-dlp; si no, pasar
+    'impersonate' a YoutubeDL provocaría un error en cada petición.
+    
+    Returns:
+        Objetivo de suplantación disponible o None.
+    """
+    try:
+        import curl_cffi  # noqa: F401
+    except ImportError:
+        return None
+    
+    try:
+        target = ImpersonateTarget.from_str(AEP_IMPERSONATE_TARGET)
+        with yt_dlp.YoutubeDL({'quiet': True, 'no_warnings': True}) as ydl:
+            # yt-dlp no ofrece una comprobación pública; se usa a propósito el
+            # método privado que valida --impersonate. Si desaparece, el
+            # AttributeError cae en el except y se sigue sin suplantación
+            if ydl._impersonate_target_available(target):
+                return target
+    except Exception as e:
+        logger.warning(f"No se pudo comprobar la suplantación con curl_cffi: {str(e)}")
+    return None
+
+
+_IMPERSONATE_TARGET = _detect_impersonate_target()
+_HAS_CURL_CFFI = _IMPERSONATE_TARGET is not None
+_HAS_ARIA2C = shutil.which('aria2c') is not None
+
+
+def _build_base_opts() -> MappingProxyType:
+    """
+    Construye las opciones de yt-dlp que no cambian entre llamadas.
+    
+    Returns:
+        Vista de solo lectura con las opciones base.
+    """
+    # Headers para simular un navegador real
+    http_headers = {
+        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
+        'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
+        'Accept-Language': 'en-US,en;q=0.5',
+        'Accept-Encoding': 'gzip, deflate',
+        'DNT': '1',
+        'Sec-Fetch-Dest': 'document',
+        'Sec-Fetch-Mode': 'navigate',
+        'Sec-Fetch-Site': 'none',
+        'Sec-Fetch-User': '?1',
+    }
+    
+    opts = {
+        'quiet': True,
+        'no_warnings': True,
+        'nocheckcertificate': True,
+        'age_limit': None,
+        'socket_timeout': 30,
+        'retries': 3,
+        'fragment_retries': 3,
+        # Extraer solo el video, no toda la playlist
+        'noplaylist': True,
+        'extract_flat': False,
+        'http_headers': http_headers,
+    }
+    
+    if _HAS_CURL_CFFI:
+        # curl_cffi replica la huella TLS de Chrome y reutiliza sesiones TLS;
+        # el User-Agent debe ser el suyo para que coincida con esa huella
+        opts['impersonate'] = _IMPERSONATE_TARGET
+        del http_headers['User-Agent']
+    
+    return MappingProxyType(opts)
 
 
 class AEPYouTubeDownloader:
@@ -29,8 +142,14 @@ class AEPYouTubeDownloader:
     
     Attributes:
         download_path: Ruta donde se guardarán los videos descargados.
+        _info_cache: Caché TTL con la información ya procesada de cada video.
+        _ydl_pool: Instancias de YoutubeDL reutilizables (LRU) con su lock.
+        _batch_local: Instancia de YoutubeDL para lotes de cada hilo.
     """
     
+    # Opciones de yt-dlp comunes a todas las llamadas (solo lectura)
+    _BASE_OPTS = _build_base_opts()
+    
     def __init__(self, download_path: str = AEP_DEFAULT_DOWNLOAD_PATH) -> None:
         """
         Inicializa el descargador de YouTube.
@@ -39,6 +158,17 @@ class AEPYouTubeDownloader:
             download_path: Ruta del directorio de descargas.
         """
         self.download_path = download_path
+        self._info_cache: TTLCache = TTLCache(
+            maxsize=AEP_INFO_CACHE_MAXSIZE,
+            ttl=AEP_INFO_CACHE_TTL_SECONDS
+        )
+        self._info_cache_lock = threading.Lock()
+        self._ydl_pool: "OrderedDict[Tuple, Tuple[yt_dlp.YoutubeDL, threading.RLock]]" = OrderedDict()
+        self._ydl_pool_lock = threading.Lock()
+        self._batch_local = threading.local()
+        self._cookies_path = AEP_COOKIES_PATH
+        self._has_cookies = self._check_cookies_file()
+        self._extractor_args = self._build_extractor_args()
         self._ensure_download_directory()
     
     def _ensure_download_directory(self) -> None:
@@ -49,18 +179,13 @@ class AEPYouTubeDownloader:
         if not os.path.exists(self.download_path):
             logger.info(f"Directorio de descargas creado: {self.download_path}")
     
-    def _get_ydl_opts(self, use_cookies: bool = True) -> Dict:
+    def _build_extractor_args(self) -> Dict:
         """
-        Genera la configuración para yt-dlp.
+        Construye los extractor_args de YouTube a partir del entorno.
         
-        Args:
-            use_cookies: Si se deben usar cookies o no.
-            
         Returns:
-            Diccionario con la configuración.
+            Diccionario con los extractor_args para yt-dlp.
         """
-        cookies_path = os.path.join(os.path.dirname(__file__), 'cookies.txt')
-        
         # Configuración de extractor_args para YouTube
         youtube_extractor_args = {
             # No saltar formatos - permitir todos para mejor compatibilidad
@@ -77,52 +202,131 @@ class AEPYouTubeDownloader:
             youtube_extractor_args['po_token'] = [f'web+{po_token}']
             logger.info("Usando PO_TOKEN para autenticación")
         
-        opts = {
-            'quiet': True,
-            'no_warnings': True,
-            'nocheckcertificate': True,
-            'age_limit': None,
-            'socket_timeout': 30,
-            'retries': 3,
-            'fragment_retries': 3,
-            # Extraer solo el video, no toda la playlist
-            'noplaylist': True,
-            'extract_flat': False,
-            # Headers para simular un navegador real
-            'http_headers': {
-                'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
-                'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
-                'Accept-Language': 'en-US,en;q=0.5',
-                'Accept-Encoding': 'gzip, deflate',
-                'DNT': '1',
-                'Sec-Fetch-Dest': 'document',
-                'Sec-Fetch-Mode': 'navigate',
-                'Sec-Fetch-Site': 'none',
-                'Sec-Fetch-User': '?1',
-            },
-            'extractor_args': {
-                'youtube': youtube_extractor_args
-            },
-        }
-        
         # Añadir visitor_data si está configurado
         if visitor_data:
-            opts['extractor_args']['youtube']['visitor_data'] = [visitor_data]
+            youtube_extractor_args['visitor_data'] = [visitor_data]
             logger.info("Usando VISITOR_DATA configurado")
         
+        return {'youtube': youtube_extractor_args}
+    
+    def _check_cookies_file(self) -> bool:
+        """
+        Comprueba una sola vez si hay un archivo de cookies utilizable.
+        
+        Returns:
+            True si el archivo existe y no está vacío.
+        """
+        if not os.path.exists(self._cookies_path):
+            return False
+        
+        # Verificar que el archivo de cookies no esté vacío
+        if os.path.getsize(self._cookies_path) <= AEP_MIN_COOKIES_SIZE:
+            logger.warning("Archivo de cookies existe pero parece vacío o muy pequeño")
+            return False
+        
+        return True
+    
+    def _get_ydl_opts(self, use_cookies: bool = True) -> Dict:
+        """
+        Genera la configuración para yt-dlp.
+        
+        Args:
+            use_cookies: Si se deben usar cookies o no.
+            
+        Returns:
+            Diccionario con la configuración.
+        """
+        # Copia superficial: las partes anidadas son fijas y no se modifican
+        opts = dict(self._BASE_OPTS)
+        opts['extractor_args'] = self._extractor_args
+        
         # Solo añadir cookies si se solicita y el archivo existe
-        if use_cookies and os.path.exists(cookies_path):
-            # Verificar que el archivo de cookies no esté vacío
-            if os.path.getsize(cookies_path) > 100:  # Archivo con contenido mínimo
-                opts['cookiefile'] = cookies_path
-                logger.info(f"Usando cookies desde: {cookies_path}")
-            else:
-                logger.warning("Archivo de cookies existe pero parece vacío o muy pequeño")
+        if use_cookies and self._has_cookies:
+            opts['cookiefile'] = self._cookies_path
+            logger.info(f"Usando cookies desde: {self._cookies_path}")
         else:
             logger.info("No se están usando cookies (archivo no encontrado o deshabilitado)")
             
         return opts
 
+    @contextmanager
+    def _borrow_ydl(
+        self,
+        key: Tuple,
+        opts_factory: Callable[[], Dict]
+    ) -> Iterator[yt_dlp.YoutubeDL]:
+        """
+        Presta una instancia de YoutubeDL ya inicializada.
+        
+        Las instancias se conservan entre peticiones para no recargar
+        extractores, cookies ni el opener HTTP. Si la instancia de esa clave
+        está ocupada por otro hilo se usa una temporal.
+        
+        Las instancias solo se toman o se descartan con _ydl_pool_lock: la
+        que sale del pool la cierra quien la tenga libre, el que la expulsa
+        o el hilo que la estaba usando al devolverla.
+        
+        Args:
+            key: Clave que identifica la configuración de la instancia.
+            opts_factory: Función que genera las opciones si hay que crearla.
+        
+        Yields:
+            Instancia de YoutubeDL lista para usar.
+        """
+        with self._ydl_pool_lock:
+            entry = self._ydl_pool.get(key)
+            if entry is not None:
+                self._ydl_pool.move_to_end(key)
+                acquired = entry[1].acquire(blocking=False)
+        
+        if entry is not None and not acquired:
+            with yt_dlp.YoutubeDL(opts_factory()) as temp_ydl:
+                yield temp_ydl
+            return
+        
+        if entry is None:
+            # Construir fuera del lock para no serializar todas las peticiones
+            entry = (yt_dlp.YoutubeDL(opts_factory()), threading.RLock())
+            entry[1].acquire()
+            with self._ydl_pool_lock:
+                replaced = self._ydl_pool.pop(key, None)
+                self._ydl_pool[key] = entry
+                discarded = [replaced] if replaced is not None else []
+                if len(self._ydl_pool) > AEP_YDL_POOL_SIZE:
+                    discarded.append(self._ydl_pool.popitem(last=False)[1])
+                # Las ocupadas las cerrará su hilo al devolverlas
+                to_close = [
+                    old_ydl for old_ydl, old_lock in discarded
+                    if old_lock.acquire(blocking=False)
+                ]
+            for old_ydl in to_close:
+                self._close_ydl(old_ydl)
+        
+        ydl, lock = entry
+        try:
+            yield ydl
+        finally:
+            with self._ydl_pool_lock:
+                evicted = self._ydl_pool.get(key) is not entry
+                lock.release()
+            if evicted:
+                self._close_ydl(ydl)
+
+    @staticmethod
+    def _close_ydl(ydl: yt_dlp.YoutubeDL) -> None:
+        """
+        Cierra una instancia expulsada del pool.
+        
+        Libera sus conexiones HTTP y guarda sus cookies.
+        
+        Args:
+            ydl: Instancia a cerrar.
+        """
+        try:
+            ydl.close()
+        except Exception as e:
+            logger.warning(f"Error al cerrar instancia de YoutubeDL: {str(e)}")
+
     def get_video_info(self, url: str) -> Optional[Dict]:
         """
         Obtiene información del video sin descargarlo.
@@ -133,17 +337,120 @@ class AEPYouTubeDownloader:
         Returns:
             Diccionario con información del video o None si hay error.
         """
+        cache_key = self._get_cache_key(url)
+        with self._info_cache_lock:
+            cached = self._info_cache.get(cache_key)
+        if cached is not None:
+            return cached
+        
         try:
             # Intentar usar cookies si existen (True), si no existen el método _get_ydl_opts lo maneja
-            opts = self._get_ydl_opts(use_cookies=True)
-            with yt_dlp.YoutubeDL(opts) as ydl:
+            with self._borrow_ydl(
+                ('info',),
+                lambda: self._get_ydl_opts(use_cookies=True)
+            ) as ydl:
                 info = ydl.extract_info(url, download=False)
-                return self._process_info(info)
+                processed = self._process_info(info)
+            
+            with self._info_cache_lock:
+                self._info_cache[cache_key] = processed
+            return processed
         except Exception as e:
             logger.error(f"Error al obtener información: {str(e)}")
             logger.error(traceback.format_exc())
             return None
 
+    def get_video_info_batch(
+        self,
+        urls: List[str],
+        executor: Executor
+    ) -> List[Optional[Dict]]:
+        """
+        Obtiene información de varios videos en paralelo.
+        
+        Las extracciones se reparten en el executor recibido, de modo que
+        respetan su límite de hilos. Cada hilo usa su propia instancia de
+        YoutubeDL y reutiliza sus conexiones HTTP entre lotes.
+        
+        Args:
+            urls: Lista de URLs de YouTube.
+            executor: Executor compartido para las llamadas a yt-dlp. No debe
+                llamarse desde uno de sus propios hilos.
+        
+        Returns:
+            Lista con la información de cada video (o None si hay error),
+            en el mismo orden que las URLs recibidas.
+        """
+        results: List[Optional[Dict]] = [None] * len(urls)
+        pending: Dict[int, str] = {}
+        
+        with self._info_cache_lock:
+            for index, url in enumerate(urls):
+                cached = self._info_cache.get(self._get_cache_key(url))
+                if cached is not None:
+                    results[index] = cached
+                else:
+                    pending[index] = url
+        
+        if not pending:
+            return results
+        
+        def extract(url: str) -> Optional[Dict]:
+            try:
+                return self._process_info(
+                    self._get_batch_ydl().extract_info(url, download=False)
+                )
+            except Exception as e:
+                logger.error(f"Error al obtener información de {url}: {str(e)}")
+                return None
+        
+        extracted = executor.map(extract, pending.values())
+        for index, processed in zip(pending, extracted):
+            results[index] = processed
+        
+        with self._info_cache_lock:
+            for index, url in pending.items():
+                if results[index] is not None:
+                    self._info_cache[self._get_cache_key(url)] = results[index]
+        
+        return results
+
+    def _get_batch_ydl(self) -> yt_dlp.YoutubeDL:
+        """
+        Obtiene la instancia de YoutubeDL para lotes del hilo actual.
+        
+        yt-dlp no es reentrante, así que cada hilo del executor tiene la
+        suya; se crea la primera vez y se conserva mientras viva el hilo.
+        
+        Returns:
+            Instancia de YoutubeDL configurada para lotes.
+        """
+        ydl = getattr(self._batch_local, 'ydl', None)
+        if ydl is None:
+            opts = self._get_ydl_opts(use_cookies=True)
+            opts.update({
+                'extract_flat': 'in_playlist',
+                # Acotar la latencia de cola del lote
+                'socket_timeout': AEP_BATCH_SOCKET_TIMEOUT,
+                'retries': AEP_BATCH_RETRIES,
+            })
+            ydl = yt_dlp.YoutubeDL(opts)
+            self._batch_local.ydl = ydl
+        return ydl
+
+    @staticmethod
+    def _get_cache_key(url: str) -> str:
+        """
+        Obtiene la clave de caché de una URL.
+        
+        Args:
+            url: URL del video de YouTube.
+        
+        Returns:
+            ID del video si se reconoce, o la URL sin espacios en otro caso.
+        """
+        return extract_video_id(url) or url.strip()
+
     def _process_info(self, info: Dict) -> Dict:
         """Procesa la información cruda de yt-dlp"""
         return {
@@ -158,7 +465,8 @@ class AEPYouTubeDownloader:
     def download_video(
         self, 
         url: str, 
-        format_id: str = 'bestvideo+bestaudio/best'
+        format_id: str = 'bestvideo+bestaudio/best',
+        output_template: Optional[str] = None
     ) -> Dict[str, any]:
         """
         Descarga un video de YouTube.
@@ -166,6 +474,9 @@ class AEPYouTubeDownloader:
         Args:
             url: URL del video de YouTube.
             format_id: Formato de descarga ('best', 'worst', o ID específico).
+            output_template: Plantilla de nombre de yt-dlp dentro del
+                directorio de descargas. Si se indica se usa una instancia
+                de YoutubeDL de un solo uso en lugar de la del pool.
         
         Returns:
             Diccionario con el resultado de la descarga.
@@ -184,18 +495,36 @@ class AEPYouTubeDownloader:
                 format_id = 'best'
             
             # Función interna para intentar descarga
-            def try_download(use_cookies=True):
+            def build_opts(use_cookies: bool) -> Dict:
                 # Intentar usar cookies si existen
                 opts = self._get_ydl_opts(use_cookies=use_cookies)
                 opts.update({
                     'format': format_id,
-                    'outtmpl': os.path.join(self.download_path, '%(title)s.%(ext)s'),
+                    'outtmpl': os.path.join(
+                        self.download_path,
+                        output_template or '%(title)s.%(ext)s'
+                    ),
                     'quiet': False,
                     'no_warnings': False,
                     'progress_hooks': [self._progress_hook],
+                    # Descargar en paralelo los fragmentos DASH/HLS
+                    'concurrent_fragment_downloads': AEP_CONCURRENT_FRAGMENTS,
                 })
-                
-                with yt_dlp.YoutubeDL(opts) as ydl:
+                if _HAS_ARIA2C:
+                    # aria2c abre varias conexiones por archivo
+                    opts['external_downloader'] = {'default': 'aria2c'}
+                    opts['external_downloader_args'] = {'aria2c': AEP_ARIA2C_ARGS}
+                return opts
+            
+            def try_download(use_cookies=True):
+                if output_template:
+                    ydl_context = yt_dlp.YoutubeDL(build_opts(use_cookies))
+                else:
+                    ydl_context = self._borrow_ydl(
+                        ('download', format_id, use_cookies),
+                        lambda: build_opts(use_cookies)
+                    )
+                with ydl_context as ydl:
                     info = ydl.extract_info(url, download=True)
                     filename = ydl.prepare_filename(info)
                     return {
@@ -226,6 +555,78 @@ class AEPYouTubeDownloader:
                 'error': f'Error inesperado: {str(e)}'
             }
     
+    def open_stream(
+        self,
+        url: str,
+        format_id: str = AEP_STREAM_FORMAT
+    ) -> subprocess.Popen:
+        """
+        Lanza yt-dlp escribiendo el video por stdout, sin pasar por disco.
+        
+        Solo sirve para formatos de un único archivo: la fusión de video y
+        audio con ffmpeg necesita un archivo de salida real.
+        
+        Args:
+            url: URL del video de YouTube.
+            format_id: Formato de descarga sin fusión ('+').
+        
+        Returns:
+            Proceso de yt-dlp con stdout y stderr conectados a tuberías.
+        """
+        cmd = [
+            sys.executable, '-m', 'yt_dlp',
+            '--quiet', '--no-warnings', '--no-playlist',
+            '-f', format_id,
+            '-o', '-',
+        ]
+        
+        cmd += self._build_cli_args()
+        
+        if self._has_cookies:
+            cmd += ['--cookies', self._cookies_path]
+        if _HAS_CURL_CFFI:
+            cmd += ['--impersonate', AEP_IMPERSONATE_TARGET]
+        
+        cmd += ['--', url]
+        return subprocess.Popen(
+            cmd,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE
+        )
+    
+    def _build_cli_args(self) -> List[str]:
+        """
+        Traduce a opciones de línea de comandos las que usa la librería.
+        
+        Así el proceso de open_stream recibe los mismos extractor_args
+        (PO_TOKEN, VISITOR_DATA, player_skip), cabeceras y ajustes de red
+        que get_video_info y download_video.
+        
+        Returns:
+            Lista de argumentos para yt-dlp.
+        """
+        base_opts = self._BASE_OPTS
+        args = [
+            '--socket-timeout', str(base_opts['socket_timeout']),
+            '--retries', str(base_opts['retries']),
+            '--fragment-retries', str(base_opts['fragment_retries']),
+        ]
+        
+        if base_opts['nocheckcertificate']:
+            args.append('--no-check-certificates')
+        
+        for name, value in base_opts['http_headers'].items():
+            args += ['--add-header', f'{name}:{value}']
+        
+        for extractor, extractor_args in self._extractor_args.items():
+            values = ';'.join(
+                f"{key}={','.join(items)}"
+                for key, items in extractor_args.items()
+            )
+            args += ['--extractor-args', f'{extractor}:{values}']
+        
+        return args
+    
     def _progress_hook(self, d: Dict) -> None:
         """
         Hook para monitorear el progreso de descarga.
@@ -13,6 +13,12 @@ const resultArea = document.getElementById('resultArea');
 const successMessage = document.getElementById('successMessage');
 const errorMessage = document.getElementById('errorMessage');
 
+// Intervalo de sondeo del estado de una descarga (ms)
+const DOWNLOAD_POLL_INTERVAL_MS = 2000;
+
+// Tiempo máximo esperando a que termine una descarga (ms)
+const DOWNLOAD_MAX_WAIT_MS = 30 * 60 * 1000;
+
 /**
  * Inicializa la aplicación
  */
@@ -244,16 +250,49 @@ async function downloadVideo(event) {
         
         const data = await response.json();
         
-        if (data.success) {
-            showSuccess(data.title, data.filename);
-        } else {
+        if (!data.success) {
             showError(data.error || 'Error al descargar el video');
+            return;
+        }
+        
+        const result = await waitForDownload(data.job_id);
+        
+        if (result.success) {
+            showSuccess(result.title, result.filename);
+        } else {
+            showError(result.error || 'Error al descargar el video');
         }
     } catch (error) {
         showError('Error de conexión: ' + error.message);
     }
 }
 
+/**
+ * Espera a que termine una descarga consultando su estado periódicamente
+ * 
+ * @param {string} jobId - Identificador del trabajo de descarga
+ * @returns {Promise<Object>} Resultado de la descarga
+ */
+async function waitForDownload(jobId) {
+    const deadline = Date.now() + DOWNLOAD_MAX_WAIT_MS;
+    
+    while (Date.now() < deadline) {
+        await new Promise(resolve => setTimeout(resolve, DOWNLOAD_POLL_INTERVAL_MS));
+        
+        const response = await fetch(`/api/download/${encodeURIComponent(jobId)}`);
+        const data = await response.json();
+        
+        if (data.done || !data.success) {
+            return data;
+        }
+    }
+    
+    return {
+        success: false,
+        error: 'La descarga está tardando demasiado. Inténtalo de nuevo más tarde.'
+    };
+}
+
 /**
  * Valida la URL de YouTube
  * 
@@ -0,0 +1,102 @@
+"""
+Pruebas del almacén de trabajos de descarga.
+"""
+import os
+import sys
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+sys.path.insert(
+    0,
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src')
+)
+
+import download_jobs  # noqa: E402
+from download_jobs import AEPDownloadJobStore  # noqa: E402
+
+
+class AEPDownloadJobStoreTest(unittest.TestCase):
+    """
+    Pruebas de creación, consulta y expiración de trabajos.
+    """
+    
+    def setUp(self) -> None:
+        """
+        Crea un almacén sobre un directorio temporal.
+        """
+        self.jobs_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.jobs_dir.cleanup)
+        self.store = AEPDownloadJobStore(jobs_path=self.jobs_dir.name)
+    
+    def test_create_returns_pending_job(self) -> None:
+        """
+        Un trabajo recién creado está pendiente y pertenece a este proceso.
+        """
+        job_id = self.store.create()
+        
+        self.assertRegex(job_id, r'^[0-9a-f]{32}$')
+        self.assertEqual(
+            self.store.get(job_id),
+            {'done': False, 'pid': os.getpid()}
+        )
+    
+    def test_complete_stores_result(self) -> None:
+        """
+        Al completar un trabajo se guarda su resultado.
+        """
+        job_id = self.store.create()
+        result = {'success': True, 'filename': 'video.mp4'}
+        
+        self.store.complete(job_id, result)
+        
+        self.assertEqual(
+            self.store.get(job_id),
+            {'done': True, 'result': result}
+        )
+    
+    def test_get_unknown_or_invalid_id(self) -> None:
+        """
+        Los identificadores desconocidos o mal formados no devuelven nada.
+        """
+        self.assertIsNone(self.store.get('0' * 32))
+        self.assertIsNone(self.store.get('../../etc/passwd'))
+        self.assertIsNone(self.store.get('A' * 32))
+    
+    def test_get_reports_orphaned_job_as_failed(self) -> None:
+        """
+        Un trabajo cuyo worker ya no existe se da por fallido.
+        """
+        job_id = self.store.create()
+        
+        with mock.patch.object(
+            download_jobs, '_is_process_alive', return_value=False
+        ):
+            job = self.store.get(job_id)
+        
+        self.assertTrue(job['done'])
+        self.assertFalse(job['result']['success'])
+        self.assertEqual(
+            job['result']['error'],
+            download_jobs.AEP_ORPHANED_JOB_ERROR
+        )
+        # El fallo queda guardado para las siguientes consultas
+        self.assertEqual(self.store.get(job_id), job)
+    
+    def test_evict_expired_removes_only_old_jobs(self) -> None:
+        """
+        evict_expired elimina solo los trabajos más antiguos que el TTL.
+        """
+        old_job = self.store.create()
+        new_job = self.store.create()
+        old_time = time.time() - self.store.ttl_seconds - 1
+        os.utime(self.store._job_file(old_job), (old_time, old_time))
+        
+        self.assertEqual(self.store.evict_expired(), 1)
+        self.assertIsNone(self.store.get(old_job))
+        self.assertIsNotNone(self.store.get(new_job))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,163 @@
+"""
+Pruebas de la ruta /api/file.
+"""
+import os
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+sys.path.insert(
+    0,
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src')
+)
+
+import app as app_module  # noqa: E402
+
+
+AEP_TEST_FILENAME = 'video de prueba.mp4'
+AEP_TEST_FILE_SIZE = 1024 * 1024
+
+
+class AEPDownloadFileTest(unittest.TestCase):
+    """
+    Pruebas del envío de archivos con Range y ?oneshot=1.
+    """
+    
+    def setUp(self) -> None:
+        """
+        Crea un archivo de prueba en un directorio de descargas temporal.
+        """
+        self.download_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.download_dir.cleanup)
+        
+        config_patch = mock.patch.dict(
+            app_module.app.config,
+            {'DOWNLOAD_FOLDER_ABS': self.download_dir.name}
+        )
+        config_patch.start()
+        self.addCleanup(config_patch.stop)
+        
+        xaccel_patch = mock.patch.object(app_module, 'AEP_USE_XACCEL', False)
+        xaccel_patch.start()
+        self.addCleanup(xaccel_patch.stop)
+        
+        self.data = os.urandom(AEP_TEST_FILE_SIZE)
+        self.filepath = os.path.join(self.download_dir.name, AEP_TEST_FILENAME)
+        with open(self.filepath, 'wb') as f:
+            f.write(self.data)
+        
+        self.client = app_module.app.test_client()
+    
+    def _get(self, query: str = '', **kwargs):
+        """
+        Descarga el archivo de prueba y cierra la respuesta.
+        
+        Args:
+            query: Query string a añadir a la URL.
+            **kwargs: Argumentos adicionales para el cliente de pruebas.
+        
+        Returns:
+            Tupla (respuesta, cuerpo).
+        """
+        response = self.client.get(
+            f'/api/file/{AEP_TEST_FILENAME}{query}',
+            **kwargs
+        )
+        body = response.get_data()
+        response.close()
+        return response, body
+    
+    def test_full_download_advertises_ranges(self) -> None:
+        """
+        Un envío completo anuncia Accept-Ranges y conserva el archivo.
+        """
+        response, body = self._get()
+        
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(body, self.data)
+        self.assertEqual(response.headers['Accept-Ranges'], 'bytes')
+        self.assertEqual(
+            response.headers['Content-Length'],
+            str(AEP_TEST_FILE_SIZE)
+        )
+        self.assertTrue(os.path.exists(self.filepath))
+    
+    def test_range_request_returns_partial_content(self) -> None:
+        """
+        Un Range válido devuelve 206 con solo los bytes pedidos.
+        """
+        start = AEP_TEST_FILE_SIZE - 100
+        response, body = self._get(headers={'Range': f'bytes={start}-'})
+        
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(body, self.data[start:])
+        self.assertEqual(
+            response.headers['Content-Range'],
+            f'bytes {start}-{AEP_TEST_FILE_SIZE - 1}/{AEP_TEST_FILE_SIZE}'
+        )
+    
+    def test_unsatisfiable_range_returns_416(self) -> None:
+        """
+        Un Range fuera del archivo devuelve 416 en JSON.
+        """
+        response, _ = self._get(
+            headers={'Range': f'bytes={AEP_TEST_FILE_SIZE + 10}-'}
+        )
+        
+        self.assertEqual(response.status_code, 416)
+        self.assertFalse(response.get_json()['success'])
+        self.assertEqual(
+            response.headers['Content-Range'],
+            f'bytes */{AEP_TEST_FILE_SIZE}'
+        )
+    
+    def test_oneshot_deletes_after_complete_send(self) -> None:
+        """
+        Con ?oneshot=1 el archivo se elimina tras enviarlo entero.
+        """
+        response, body = self._get('?oneshot=1')
+        
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(body, self.data)
+        self.assertFalse(os.path.exists(self.filepath))
+    
+    def test_oneshot_keeps_file_when_send_is_aborted(self) -> None:
+        """
+        Si el cliente corta la descarga el archivo se conserva.
+        """
+        response = self.client.get(
+            f'/api/file/{AEP_TEST_FILENAME}?oneshot=1',
+            buffered=False
+        )
+        first_chunk = next(iter(response.response))
+        response.close()
+        
+        self.assertLess(len(first_chunk), AEP_TEST_FILE_SIZE)
+        self.assertTrue(os.path.exists(self.filepath))
+    
+    def test_oneshot_keeps_file_on_head_and_range(self) -> None:
+        """
+        HEAD y las respuestas parciales no eliminan el archivo.
+        """
+        response = self.client.head(f'/api/file/{AEP_TEST_FILENAME}?oneshot=1')
+        response.close()
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(os.path.exists(self.filepath))
+        
+        response, _ = self._get('?oneshot=1', headers={'Range': 'bytes=0-9'})
+        self.assertEqual(response.status_code, 206)
+        self.assertTrue(os.path.exists(self.filepath))
+    
+    def test_path_outside_download_folder_is_rejected(self) -> None:
+        """
+        Las rutas que salen del directorio de descargas no se sirven.
+        """
+        response = self.client.get('/api/file/..%2F..%2Fetc%2Fpasswd')
+        
+        self.assertEqual(response.status_code, 403)
+        self.assertFalse(response.get_json()['success'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,105 @@
+"""
+Pruebas de la ruta /api/stream.
+"""
+import io
+import os
+import sys
+import unittest
+from unittest import mock
+
+sys.path.insert(
+    0,
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src')
+)
+
+import app as app_module  # noqa: E402
+
+
+AEP_TEST_URL = 'https://www.youtube.com/watch?v=dQw4w9WgXcQ'
+
+
+class AEPFakeProcess:
+    """
+    Proceso de yt-dlp simulado que escribe un video por stdout.
+    """
+    
+    def __init__(self, data: bytes) -> None:
+        """
+        Prepara las tuberías simuladas del proceso.
+        
+        Args:
+            data: Bytes que el proceso escribirá por stdout.
+        """
+        self.stdout = io.BytesIO(data)
+        self.stderr = io.BytesIO()
+        self.returncode = None
+    
+    def poll(self):
+        """
+        Devuelve el código de salida o None si sigue en ejecución.
+        """
+        return self.returncode
+    
+    def kill(self) -> None:
+        """
+        Simula la terminación forzada del proceso.
+        """
+        self.returncode = -9
+    
+    def wait(self) -> int:
+        """
+        Simula la espera a que el proceso termine.
+        
+        Returns:
+            Código de salida del proceso.
+        """
+        if self.returncode is None:
+            self.returncode = 0
+        return self.returncode
+
+
+class AEPStreamVideoTest(unittest.TestCase):
+    """
+    Pruebas del envío en stream de formatos sin fusión.
+    """
+    
+    def setUp(self) -> None:
+        """
+        Crea el cliente de pruebas de Flask.
+        """
+        self.client = app_module.app.test_client()
+    
+    def test_stream_single_file_format(self) -> None:
+        """
+        Un formato sin fusión se envía por stdout y libera su hueco al cerrar.
+        """
+        data = b'video' * 1000
+        
+        with mock.patch.object(
+            app_module.downloader,
+            'get_video_info',
+            return_value={'title': 'Video de prueba'}
+        ), mock.patch.object(
+            app_module.downloader,
+            'open_stream',
+            return_value=AEPFakeProcess(data)
+        ) as open_stream:
+            response = self.client.get(
+                '/api/stream',
+                query_string={'url': AEP_TEST_URL}
+            )
+            body = response.get_data()
+            response.close()
+        
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(body, data)
+        self.assertIn('Video de prueba.mp4', response.headers['Content-Disposition'])
+        open_stream.assert_called_once_with(
+            AEP_TEST_URL,
+            app_module.AEP_STREAM_FORMAT
+        )
+        self.assertEqual(app_module.active_downloads, 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,66 @@
+"""
+Pruebas de las utilidades del descargador de YouTube.
+"""
+import os
+import sys
+import unittest
+
+sys.path.insert(
+    0,
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src')
+)
+
+from youtube_downloader import extract_video_id  # noqa: E402
+
+
+AEP_VIDEO_ID = 'dQw4w9WgXcQ'
+
+
+class AEPExtractVideoIdTest(unittest.TestCase):
+    """
+    Pruebas de la validación de URLs de YouTube.
+    """
+    
+    def test_supported_url_formats(self) -> None:
+        """
+        Se reconoce el ID en los formatos de enlace habituales.
+        """
+        urls = [
+            f'https://www.youtube.com/watch?v={AEP_VIDEO_ID}',
+            f'http://youtube.com/watch?feature=share&v={AEP_VIDEO_ID}',
+            f'youtube.com/watch?v={AEP_VIDEO_ID}&t=42s',
+            f'https://m.youtube.com/watch?v={AEP_VIDEO_ID}',
+            f'https://music.youtube.com/watch?v={AEP_VIDEO_ID}',
+            f'https://youtu.be/{AEP_VIDEO_ID}',
+            f'https://youtu.be/{AEP_VIDEO_ID}?si=abc',
+            f'https://www.youtube.com/shorts/{AEP_VIDEO_ID}',
+            f'https://www.youtube.com/embed/{AEP_VIDEO_ID}',
+            f'https://www.youtube.com/live/{AEP_VIDEO_ID}',
+            f'  https://youtu.be/{AEP_VIDEO_ID}  ',
+        ]
+        
+        for url in urls:
+            with self.subTest(url=url):
+                self.assertEqual(extract_video_id(url), AEP_VIDEO_ID)
+    
+    def test_rejected_urls(self) -> None:
+        """
+        Las URLs que no son de un video de YouTube devuelven None.
+        """
+        urls = [
+            '',
+            'not a url',
+            'https://example.com/watch?v=dQw4w9WgXcQ',
+            'https://www.youtube.com/watch?v=short',
+            'https://www.youtube.com/watch?v=dQw4w9WgXcQextra',
+            'https://www.youtube.com/channel/UC1234567890',
+            'https://evil.com/?u=https://youtu.be/dQw4w9WgXcQ',
+        ]
+        
+        for url in urls:
+            with self.subTest(url=url):
+                self.assertIsNone(extract_video_id(url))
+
+
+if __name__ == '__main__':
+    unittest.main()